@@ -1,20 +1,31 @@
+import math
 import re
 import os
+import uuid
 from datetime import datetime, timedelta
 from urllib.parse import quote_plus
 
-from flask import Flask, render_template, request, redirect, url_for, flash
+import click
+from flask import Flask, render_template, request, redirect, url_for, flash, abort
 from flask.cli import with_appcontext
 from flask_migrate import Migrate
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from sqlalchemy import create_engine, event, inspect, update
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash
 
 try:
-    from .config import Config, ProdConfig
+    from .config import Config, ProdConfig, EdgeConfig
     from .models import db, Supplier, Item, Outlet, Order, OrderItem, User
+    from .sync import sync_once, sync_forever
+    from .metrics import init_metrics, ORDERS_SUBMITTED
+    from .archive import ensure_partitions, archive_old_orders, find_archived_order
 except ImportError:
-    from config import Config, ProdConfig
+    from config import Config, ProdConfig, EdgeConfig
     from models import db, Supplier, Item, Outlet, Order, OrderItem, User
+    from sync import sync_once, sync_forever
+    from metrics import init_metrics, ORDERS_SUBMITTED
+    from archive import ensure_partitions, archive_old_orders, find_archived_order
 
 migrate = Migrate()
 login_manager = LoginManager()
@@ -52,15 +63,56 @@ def _build_whatsapp_text(outlet_name, items, notes, address="", delivery_date=""
     lines.append(f"PO Ref: {_po_ref('SR')}")
     return "\n".join(lines)
 
+# Sets the SQLITE_PRAGMAS from the config on every new SQLite connection
+def _configure_sqlite(app):
+    pragmas = app.config.get("SQLITE_PRAGMAS")
+    if not pragmas:
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+# Where archived order history files live
+def _archive_dir(app):
+    return app.config.get("ORDER_ARCHIVE_DIR") or os.path.join(app.instance_path, "order_archive")
+
 # This creates the app using the config
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     db.init_app(app)
+    _configure_sqlite(app)
+    init_metrics(app)
     migrate.init_app(app, db)  # Change this line
     login_manager.init_app(app)
     login_manager.login_view = "login"
 
+    # On an outlet box (FLASK_ENV=edge) these come from central via `flask sync`;
+    # a local change would be deleted or overwritten by the next pull
+    central_owned = {
+        "suppliers_create", "edit_supplier", "supplier_delete",
+        "item_create", "item_update", "items_bulk_update", "item_delete",
+        "outlet_setup", "outlet_create", "register", "reset_password",
+    }
+
+    @app.before_request
+    def _block_central_owned_writes():
+        if (
+            app.config.get("CENTRAL_DATABASE_URL")
+            and request.method == "POST"
+            and request.endpoint in central_owned
+        ):
+            flash("Suppliers, items, outlets and accounts are managed centrally", "error")
+            return redirect(url_for("suppliers_list"))
+
     # Allows initiating the db via $flask init-db
     @app.cli.command("init-db")
     @with_appcontext
@@ -68,6 +120,59 @@ def create_app(config_class=Config):
         db.create_all()
         print("DB initialized")
 
+    # Pushes local orders to / pulls the catalog from CENTRAL_DATABASE_URL via $flask sync
+    @app.cli.command("sync")
+    @click.option("--loop", is_flag=True, help="Keep running, syncing every SYNC_INTERVAL seconds.")
+    @click.option("--retry-failed", is_flag=True, help="Retry orders central rejected before.")
+    @with_appcontext
+    def sync_command(loop, retry_failed):
+        central_url = app.config.get("CENTRAL_DATABASE_URL")
+        if not central_url:
+            raise click.UsageError("CENTRAL_DATABASE_URL is not set (run with FLASK_ENV=edge)")
+        if retry_failed:
+            with db.engine.begin() as conn:
+                conn.execute(update(Order).where(Order.sync_error.is_not(None)).values(sync_error=None))
+        # create_all doesn't add columns to existing tables, e.g. an old app.db
+        if "updated_at" not in {c["name"] for c in inspect(db.engine).get_columns("items")}:
+            raise click.ClickException(
+                f"{db.engine.url.database} predates edge sync; point EDGE_DATABASE_URL at a new file and run flask init-db"
+            )
+        central = create_engine(central_url, pool_pre_ping=True)
+        batch_size = app.config.get("SYNC_BATCH_SIZE", 200)
+        if loop:
+            sync_forever(db.engine, central, batch_size, app.config.get("SYNC_INTERVAL", 30))
+        pulled, pushed = sync_once(db.engine, central, batch_size)
+        print(f"Pulled {pulled} catalog rows, pushed {pushed} orders")
+
+    # Creates the coming months' orders/order_items partitions via $flask ensure-partitions (run daily)
+    @app.cli.command("ensure-partitions")
+    @click.option("--months-ahead", default=3, show_default=True)
+    @with_appcontext
+    def ensure_partitions_command(months_ahead):
+        try:
+            with db.engine.begin() as conn:
+                created = ensure_partitions(conn, months_ahead)
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc))
+        print(f"Created {len(created)} partitions: {', '.join(created) or '-'}")
+
+    # Moves order history older than ORDER_RETENTION_MONTHS to gzipped JSONL via $flask archive-orders
+    @app.cli.command("archive-orders")
+    @click.option("--retention-months", type=int, help="Defaults to ORDER_RETENTION_MONTHS.")
+    @with_appcontext
+    def archive_orders_command(retention_months):
+        if retention_months is None:
+            retention_months = app.config["ORDER_RETENTION_MONTHS"]
+        try:
+            with db.engine.begin() as conn:
+                ensure_partitions(conn)
+            archived = archive_old_orders(db.engine, _archive_dir(app), retention_months)
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc))
+        for month, count in archived.items():
+            print(f"{month}: archived {count} orders")
+        print(f"Archived {len(archived)} months to {_archive_dir(app)}")
+
     # ---- Suppliers (list + quick create) ----
     @app.get("/")
     @login_required
@@ -216,6 +321,111 @@ def create_app(config_class=Config):
 
         flash("Item updated", "ok")
         return redirect(url_for("supplier_items", supplier_id=item_obj.supplier_id))
+    # Spreadsheet-style editing of every item of a supplier, saved in one transaction
+    @app.get("/suppliers/<int:supplier_id>/items/bulk-edit")
+    def items_bulk_edit(supplier_id):
+        supplier = Supplier.query.get_or_404(supplier_id)
+        items = Item.query.filter_by(supplier_id=supplier.id).order_by(Item.name.asc()).all()
+        return render_template(
+            "items_bulk_edit.html", supplier=supplier, items=items, submitted={}, errors={}
+        )
+
+    @app.post("/suppliers/<int:supplier_id>/items/bulk-edit")
+    def items_bulk_update(supplier_id):
+        supplier = Supplier.query.get_or_404(supplier_id)
+        items = Item.query.filter_by(supplier_id=supplier.id).order_by(Item.name.asc()).all()
+        item_ids = {it.id for it in items}
+
+        # Only changed rows are posted; each one carries a row_<item_id> marker
+        changes, submitted, errors = [], {}, {}
+        for key in request.form:
+            m = re.match(r"row_(\d+)$", key)
+            if not m:
+                continue
+            item_id = int(m.group(1))
+            if item_id not in item_ids:
+                continue
+            row = {
+                "id": item_id,
+                "name": (request.form.get(f"name_{item_id}") or "").strip(),
+                "unit": (request.form.get(f"unit_{item_id}") or "").strip(),
+                "default_qty": (request.form.get(f"default_qty_{item_id}") or "1").strip(),
+                "item_type": (request.form.get(f"item_type_{item_id}") or "").strip(),
+                "active": request.form.get(f"active_{item_id}") == "on",
+            }
+            submitted[item_id] = row
+            if not row["name"] or not row["unit"]:
+                errors[item_id] = "Name and unit are required"
+                continue
+            too_long = [
+                field for field in ("name", "unit", "item_type")
+                if len(row[field]) > Item.__table__.c[field].type.length
+            ]
+            if too_long:
+                errors[item_id] = f"Too long: {', '.join(too_long)}"
+                continue
+            try:
+                dq = float(row["default_qty"])
+                # float() accepts "nan" and "inf"
+                if not math.isfinite(dq) or dq <= 0:
+                    raise ValueError
+            except ValueError:
+                errors[item_id] = "Default qty must be a positive number"
+                continue
+            changes.append({**row, "default_qty": dq})
+
+        # Check uq_item_per_supplier against the catalog as it will look after the save
+        final_names = {it.id: it.name for it in items}
+        final_names.update({c["id"]: c["name"] for c in changes})
+        name_counts = {}
+        for name in final_names.values():
+            name_counts[name] = name_counts.get(name, 0) + 1
+        for c in changes:
+            if name_counts[c["name"]] > 1:
+                errors[c["id"]] = "Item name must be unique per supplier"
+
+        if errors:
+            flash(f"{len(errors)} row(s) need fixing, nothing was saved", "error")
+            return render_template(
+                "items_bulk_edit.html",
+                supplier=supplier,
+                items=items,
+                submitted=submitted,
+                errors=errors,
+            ), 400
+
+        if not changes:
+            flash("No changes to save", "ok")
+            return redirect(url_for("supplier_items", supplier_id=supplier.id))
+
+        current_names = {it.id: it.name for it in items}
+        renamed = [c["id"] for c in changes if c["name"] != current_names[c["id"]]]
+        try:
+            # Names moving between rows (e.g. a swap) would clash mid-update,
+            # so park the renamed rows under throwaway names first
+            if any(final_names[i] in current_names.values() for i in renamed):
+                db.session.execute(
+                    update(Item), [{"id": i, "name": f"~{i}~{uuid.uuid4().hex}"} for i in renamed]
+                )
+            # One executemany UPDATE keyed on the primary key
+            db.session.execute(update(Item), changes)
+            db.session.commit()
+        except IntegrityError:
+            # Someone else took one of the new names since the check above
+            db.session.rollback()
+            errors = {i: "Item name must be unique per supplier" for i in renamed}
+            flash("Item names must be unique per supplier, nothing was saved", "error")
+            return render_template(
+                "items_bulk_edit.html",
+                supplier=supplier,
+                items=items,
+                submitted=submitted,
+                errors=errors,
+            ), 400
+
+        flash(f"{len(changes)} item(s) updated", "ok")
+        return redirect(url_for("supplier_items", supplier_id=supplier.id))
+
     # Deleting an item
     @app.post("/items/<int:item_id>/delete")
     def item_delete(item_id):
@@ -247,6 +457,7 @@ def create_app(config_class=Config):
         )
     # Posting in suppliers will give preview of order
     @app.post("/suppliers/<int:supplier_id>/order/preview")
+    @login_required
     def order_preview(supplier_id):
         supplier = Supplier.query.get_or_404(supplier_id)
         outlet_name = request.form.get("outlet_name", "").strip()
@@ -296,6 +507,7 @@ def create_app(config_class=Config):
     
         # Create new order
         order = Order(
+            user_id=current_user.id,
             supplier_id=supplier.id,
             outlet_name=outlet_name,
             address=address,
@@ -310,13 +522,16 @@ def create_app(config_class=Config):
         for item_data in selected:
             order_item = OrderItem(
                 order_id=order.id,
+                created_at=order.created_at,
                 item_name=item_data['name'],
                 unit=item_data['unit'],
-                quantity=item_data['qty']
+                quantity=item_data['qty'],
+                user_id=current_user.id,
             )
             db.session.add(order_item)
     
         db.session.commit()
+        ORDERS_SUBMITTED.inc()
         flash("Order saved to history!", "ok")
 
         # Build WhatsApp message
@@ -348,10 +563,14 @@ def create_app(config_class=Config):
         orders = Order.query.order_by(Order.created_at.desc()).all()
         return render_template("order_history.html", orders=orders)
 
-    # Route to view specific order details
+    # Route to view specific order details, falling back to the archive files
     @app.get("/orders/<int:order_id>")
     def order_detail(order_id):
-        order = Order.query.get_or_404(order_id)
+        order = Order.query.get(order_id)
+        if order is None:
+            order = find_archived_order(db.session, _archive_dir(app), order_id)
+            if order is None:
+                abort(404)
         return render_template("order_detail.html", order=order)
 
     # This is to setup the outlet
@@ -450,6 +669,8 @@ def create_app(config_class=Config):
 # Choose config based on environment variable# Choose config based on environment variable
 if os.getenv("FLASK_ENV") == "production":
     app = create_app(ProdConfig)
+elif os.getenv("FLASK_ENV") == "edge":
+    app = create_app(EdgeConfig)
 else:
     app = create_app(Config)
 
@@ -0,0 +1,263 @@
+"""Monthly partitions for orders/order_items on Postgres, and their archival.
+
+orders and order_items are range-partitioned by created_at month, with
+partitions named <table>_pYYYYMM (see the partition_orders_by_month migration).
+Partitions older than the retention window are written out to
+orders_YYYY_MM.jsonl.gz (one order per line, items embedded) and dropped;
+order_archives records which ids each file holds so order_detail can still
+find them.
+"""
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import DBAPIError
+
+try:
+    from .models import OrderArchive, Supplier
+except ImportError:
+    from models import OrderArchive, Supplier
+
+# Parent table first: order_items references orders
+PARTITIONED_TABLES = ("orders", "order_items")
+
+
+def _month_start(d):
+    return datetime(d.year, d.month, 1)
+
+
+def _add_months(d, months):
+    month = d.month - 1 + months
+    return datetime(d.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def _default_months(conn):
+    """Months that have rows sitting in the default partitions."""
+    months = set()
+    for table in PARTITIONED_TABLES:
+        if conn.scalar(text("SELECT to_regclass(:name)"), {"name": f"{table}_default"}) is None:
+            continue
+        months.update(conn.scalars(text(
+            f"SELECT DISTINCT date_trunc('month', created_at) FROM {table}_default"
+        )))
+    return months
+
+
+def _create_month(conn, month):
+    """Create one month's partitions, moving its rows out of the default ones.
+
+    Postgres refuses a new range partition while the default partition holds
+    rows in that range, so those rows are parked in temp tables, the
+    partitions are created, and the rows are put back through the parent.
+    """
+    upper = _add_months(month, 1)
+    missing = [
+        t for t in PARTITIONED_TABLES
+        if conn.scalar(text("SELECT to_regclass(:name)"), {"name": partition_name(t, month)}) is None
+    ]
+    if not missing:
+        return []
+    in_month = "created_at >= :lower AND created_at < :upper"
+    params = {"lower": month, "upper": upper}
+    parked = []
+    # Items first: they reference orders
+    for table in reversed(missing):
+        if conn.scalar(text("SELECT to_regclass(:name)"), {"name": f"{table}_default"}) is None:
+            continue
+        conn.execute(text(
+            f"CREATE TEMP TABLE _parked_{table} ON COMMIT DROP AS "
+            f"SELECT * FROM {table}_default WHERE {in_month}"
+        ), params)
+        conn.execute(text(f"DELETE FROM {table}_default WHERE {in_month}"), params)
+        parked.append(table)
+
+    created = []
+    for table in missing:
+        name = partition_name(table, month)
+        try:
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            ))
+        except DBAPIError as exc:
+            raise RuntimeError(f"Could not create partition {name}: {exc.orig}") from exc
+        created.append(name)
+    for table in missing:
+        if table in parked:
+            conn.execute(text(f"INSERT INTO {table} SELECT * FROM _parked_{table}"))
+            conn.execute(text(f"DROP TABLE _parked_{table}"))
+    return created
+
+
+def ensure_partitions(conn, months_ahead=3):
+    """Create monthly partitions from this month up to `months_ahead` months out.
+
+    Run it regularly (e.g. a daily cron of `flask ensure-partitions`). Rows
+    for a month without a partition land in the *_default partition; any
+    such month also gets its partitions here and its rows moved into them.
+    Returns the names of the partitions created.
+    """
+    if conn.dialect.name != "postgresql":
+        return []
+    start = _month_start(datetime.utcnow())
+    months = {_add_months(start, i) for i in range(months_ahead + 1)}
+    months.update(_default_months(conn))
+    created = []
+    for month in sorted(months):
+        created.extend(_create_month(conn, month))
+    return created
+
+
+def _order_partitions(conn):
+    names = conn.scalars(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'orders'::regclass"
+    ))
+    months = []
+    for name in names:
+        m = re.fullmatch(r"orders_p(\d{4})(\d{2})", name)
+        if m:
+            months.append(datetime(int(m.group(1)), int(m.group(2)), 1))
+    return sorted(months)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _read_archive(path):
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh]
+
+
+def archive_month(conn, archive_dir, month):
+    """Write one month of orders to a gzipped JSONL file and drop its partitions.
+
+    The file is fully written and synced before the partitions go, and both
+    happen in the caller's transaction along with the order_archives row.
+    A month archived before (late rows brought its partition back) is merged
+    with its earlier file into a new file, so the old one is never
+    overwritten. Returns (orders archived, superseded file path or None); the
+    caller removes the superseded file once the transaction has committed.
+    """
+    orders_part = partition_name("orders", month)
+    items_part = partition_name("order_items", month)
+    orders = conn.execute(text(f"SELECT * FROM {orders_part} ORDER BY id")).mappings().all()
+    items = {}
+    for line in conn.execute(text(f"SELECT * FROM {items_part} ORDER BY id")).mappings():
+        items.setdefault(line["order_id"], []).append(dict(line))
+
+    superseded = None
+    if orders:
+        key = f"{month:%Y-%m}"
+        existing = conn.execute(
+            select(OrderArchive.__table__).where(OrderArchive.month == key)
+        ).mappings().first()
+        filename = f"orders_{month:%Y_%m}.jsonl.gz"
+        earlier = os.path.join(archive_dir, existing["filename"] if existing else filename)
+        if existing and not os.path.exists(earlier):
+            raise RuntimeError(f"{earlier} is missing; restore it before archiving {key} again")
+        records = {}
+        if existing or os.path.exists(earlier):
+            # A file without a row is left from a run that rolled back; its
+            # orders are still in the partition, so merging is harmless
+            records = {r["id"]: r for r in _read_archive(earlier)}
+            filename = f"orders_{month:%Y_%m}_{datetime.utcnow():%Y%m%d%H%M%S}.jsonl.gz"
+            superseded = earlier
+        for order in orders:
+            record = {**order, "items": items.get(order["id"], [])}
+            # Round-trip so new and earlier records have the same (JSON) types
+            records[order["id"]] = json.loads(json.dumps(record, default=_json_default))
+
+        path = os.path.join(archive_dir, filename)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as raw:
+            with gzip.open(raw, "wt", encoding="utf-8") as fh:
+                for order_id in sorted(records):
+                    fh.write(json.dumps(records[order_id]) + "\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+
+        values = dict(
+            filename=filename,
+            min_order_id=min(records),
+            max_order_id=max(records),
+            order_count=len(records),
+            archived_at=datetime.utcnow(),
+        )
+        if existing:
+            conn.execute(
+                OrderArchive.__table__.update()
+                .where(OrderArchive.id == existing["id"])
+                .values(**values)
+            )
+        else:
+            conn.execute(insert(OrderArchive.__table__).values(month=key, **values))
+
+    # Items first so no row still references the orders partition
+    for name, table in ((items_part, "order_items"), (orders_part, "orders")):
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+    return len(orders), superseded
+
+
+def archive_old_orders(engine, archive_dir, retention_months=24):
+    """Archive every monthly partition that ended before the retention window.
+
+    Each month is archived in its own transaction. Returns {"YYYY-MM": count}.
+    """
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("Order archival needs the partitioned Postgres tables")
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = _add_months(_month_start(datetime.utcnow()), -retention_months)
+    with engine.connect() as conn:
+        months = [m for m in _order_partitions(conn) if m < cutoff]
+    archived = {}
+    for month in months:
+        with engine.begin() as conn:
+            archived[f"{month:%Y-%m}"], superseded = archive_month(conn, archive_dir, month)
+        if superseded:
+            os.remove(superseded)
+    return archived
+
+
+def _parse_dt(value, parse):
+    return parse(value) if value else None
+
+
+def find_archived_order(session, archive_dir, order_id):
+    """Load an archived order in the shape order_detail.html expects, or None."""
+    archives = session.execute(
+        select(OrderArchive)
+        .where(OrderArchive.min_order_id <= order_id, OrderArchive.max_order_id >= order_id)
+        .order_by(OrderArchive.month)
+    ).scalars().all()
+    for archive in archives:
+        with gzip.open(os.path.join(archive_dir, archive.filename), "rt", encoding="utf-8") as fh:
+            for line in fh:
+                record = json.loads(line)
+                if record["id"] != order_id:
+                    continue
+                items = record.pop("items")
+                record["created_at"] = _parse_dt(record["created_at"], datetime.fromisoformat)
+                record["delivery_date"] = _parse_dt(record["delivery_date"], date.fromisoformat)
+                supplier = session.get(Supplier, record["supplier_id"])
+                return SimpleNamespace(
+                    **record,
+                    supplier=supplier or SimpleNamespace(name="(deleted supplier)"),
+                    order_items=[SimpleNamespace(**it) for it in items],
+                    archived=True,
+                )
+    return None
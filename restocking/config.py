@@ -11,6 +11,11 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
+    # /metrics is only served when this is set (sent as a Bearer token)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    # Order history older than this is moved to gzipped JSONL by `flask archive-orders`
+    ORDER_RETENTION_MONTHS = int(os.getenv("ORDER_RETENTION_MONTHS", "24"))
+    ORDER_ARCHIVE_DIR = os.getenv("ORDER_ARCHIVE_DIR")  # defaults to instance/order_archive
 
 class ProdConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get(
@@ -27,4 +32,28 @@ class ProdConfig(Config):
             "sslmode": "require",
             "connect_timeout": 10,
         },
-    }
\ No newline at end of file
+    }
+
+class EdgeConfig(Config):
+    # On-site outlet box: order entry runs against a local SQLite file
+    # (edge.db in the instance folder, created by `flask init-db`) and
+    # `flask sync` talks to the central Postgres. Not the bundled app.db:
+    # that predates the sync columns.
+    SQLALCHEMY_DATABASE_URI = os.getenv("EDGE_DATABASE_URL", "sqlite:///edge.db")
+    CENTRAL_DATABASE_URL = Config.SQLALCHEMY_DATABASE_URI
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "connect_args": {
+            "timeout": 5,  # seconds the sqlite3 driver waits on a locked db
+        },
+    }
+    # Applied to every new SQLite connection (see _configure_sqlite in app.py)
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",        # readers don't block the writer
+        "synchronous": "NORMAL",      # safe with WAL, far fewer fsyncs
+        "mmap_size": 268435456,       # 256 MB memory-mapped reads
+        "busy_timeout": 5000,         # ms to wait for a lock before erroring
+        "temp_store": "MEMORY",
+        "cache_size": -16000,         # ~16 MB page cache
+    }
+    SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "200"))
+    SYNC_INTERVAL = int(os.getenv("SYNC_INTERVAL", "30"))  # seconds between syncs
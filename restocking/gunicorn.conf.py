@@ -0,0 +1,22 @@
+# Loaded automatically by gunicorn when started from this directory.
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    # Files left by the previous run would otherwise be added into the new totals
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for name in glob.glob(os.path.join(path, "*.db")):
+            os.remove(name)
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges from the /metrics totals; without
+    # the env var there are no files to clean up (and prometheus_client would
+    # raise, taking down the arbiter)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,150 @@
+"""Prometheus metrics for the app, served at /metrics.
+
+Under gunicorn every worker is its own process, so set
+PROMETHEUS_MULTIPROC_DIR to a directory: each worker then writes its samples
+there and /metrics adds them up across workers (gunicorn.conf.py empties it
+on start and cleans up after workers that exit).
+"""
+import hmac
+import os
+import time
+
+from flask import Response, abort, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+try:
+    from .models import db
+except ImportError:
+    from models import db
+
+REQUEST_LATENCY = Histogram(
+    "restocking_request_duration_seconds",
+    "Time spent handling a request",
+    ["endpoint", "method"],
+)
+REQUEST_COUNT = Counter(
+    "restocking_requests_total",
+    "Requests handled, by response status",
+    ["endpoint", "method", "status"],
+)
+ORDERS_SUBMITTED = Counter(
+    "restocking_orders_submitted_total",
+    "Orders saved to history",
+)
+POOL_CHECKED_OUT = Gauge(
+    "restocking_db_pool_checked_out",
+    "Database connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+POOL_OVERFLOW = Gauge(
+    "restocking_db_pool_overflow",
+    "Connections open beyond pool_size (negative while the pool is filling)",
+    multiprocess_mode="livesum",
+)
+# Covers waiting on a full pool and, while the pool can still grow, opening
+# a new connection (TLS handshake included); there is no event for the wait alone
+POOL_CHECKOUT = Histogram(
+    "restocking_db_pool_checkout_seconds",
+    "Time to get a connection from the pool, including opening a new one",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+# One series per live worker, labelled with its pid
+WORKER = Gauge(
+    "restocking_worker",
+    "Live worker processes",
+    ["pid"],
+    multiprocess_mode="liveall",
+)
+
+
+def _instrument_pool(engine):
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return  # e.g. StaticPool for in-memory SQLite
+
+    # Read engine.pool each time: dispose() swaps in a new pool
+    def _on_checkout(*_args):
+        pool = engine.pool
+        POOL_CHECKED_OUT.set(pool.checkedout())
+        POOL_OVERFLOW.set(pool.overflow())
+
+    # checkin fires before the connection goes back, so the pool still counts
+    # it; report what the pool will hold once it is returned. A full queue
+    # means the connection gets closed and overflow drops by one.
+    def _on_checkin(*_args):
+        pool = engine.pool
+        POOL_CHECKED_OUT.set(pool.checkedout() - 1)
+        overflow = pool.overflow()
+        if pool.checkedin() >= pool.size():
+            overflow -= 1
+        POOL_OVERFLOW.set(overflow)
+
+    event.listen(engine, "checkout", _on_checkout)
+    event.listen(engine, "checkin", _on_checkin)
+
+    _time_checkout(engine.pool)
+    # dispose() replaces the pool; wrap the new one too
+    event.listen(engine, "engine_disposed", lambda eng: _time_checkout(eng.pool))
+
+
+def _time_checkout(pool):
+    # Pools have no event before a checkout starts, so wrap the call that
+    # hands out (or opens) a connection
+    do_get = pool._do_get
+
+    def _timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            POOL_CHECKOUT.observe(time.perf_counter() - start)
+
+    pool._do_get = _timed_do_get
+
+def init_metrics(app):
+    with app.app_context():
+        _instrument_pool(db.engine)
+    WORKER.labels(str(os.getpid())).set(1)
+
+    @app.before_request
+    def _start_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("_request_started", None)
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            REQUEST_LATENCY.labels(endpoint, request.method).observe(
+                time.perf_counter() - started
+            )
+            REQUEST_COUNT.labels(endpoint, request.method, response.status_code).inc()
+        return response
+
+    # Only served when METRICS_TOKEN is set; scrape with "Authorization: Bearer <token>"
+    @app.get("/metrics")
+    def metrics():
+        token = app.config.get("METRICS_TOKEN")
+        if not token:
+            abort(404)
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        # Compare bytes: compare_digest rejects non-ASCII str
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            abort(401)
+
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,67 @@
+"""Edge sync tracking columns
+
+Revision ID: 7c1e4b9a2d10
+Revises: 349bba70a48b
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4b9a2d10'
+down_revision = '349bba70a48b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sync_state',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.String(length=200), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('suppliers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.func.now()))
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.func.now()))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sync_uuid', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('synced_at', sa.DateTime(), nullable=True))
+
+    # Give existing orders a sync_uuid before the unique index goes on, in one
+    # statement (32 hex chars, like uuid4().hex)
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        op.execute("UPDATE orders SET sync_uuid = md5(random()::text || id::text)")
+    elif conn.dialect.name == 'sqlite':
+        op.execute("UPDATE orders SET sync_uuid = lower(hex(randomblob(16)))")
+    else:
+        orders = sa.table('orders', sa.column('id', sa.Integer), sa.column('sync_uuid', sa.String))
+        for order_id in conn.execute(sa.select(orders.c.id)).scalars().all():
+            conn.execute(
+                orders.update().where(orders.c.id == order_id).values(sync_uuid=uuid.uuid4().hex)
+            )
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_orders_sync_uuid'), ['sync_uuid'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_orders_sync_uuid'))
+        batch_op.drop_column('synced_at')
+        batch_op.drop_column('sync_uuid')
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('suppliers', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    op.drop_table('sync_state')
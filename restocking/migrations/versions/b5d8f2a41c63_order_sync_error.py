@@ -0,0 +1,26 @@
+"""Order sync error
+
+Revision ID: b5d8f2a41c63
+Revises: e3a9c5f1b7d2
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d8f2a41c63'
+down_revision = 'e3a9c5f1b7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sync_error', sa.String(length=200), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('sync_error')
@@ -0,0 +1,153 @@
+"""Partition orders by month
+
+Revision ID: e3a9c5f1b7d2
+Revises: 7c1e4b9a2d10
+Create Date: 2026-10-19 11:30:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a9c5f1b7d2'
+down_revision = '7c1e4b9a2d10'
+branch_labels = None
+depends_on = None
+
+# Future months to create up front; `flask ensure-partitions` keeps this topped up
+MONTHS_AHEAD = 3
+
+
+def _add_months(d, months):
+    month = d.month - 1 + months
+    return datetime(d.year + month // 12, month % 12 + 1, 1)
+
+
+def upgrade():
+    op.create_table('order_archives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('min_order_id', sa.Integer(), nullable=False),
+    sa.Column('max_order_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('month')
+    )
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+
+    conn = op.get_bind()
+    op.execute("UPDATE orders SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+
+    # Partitioning is Postgres only; SQLite outlet databases stay as plain tables
+    if conn.dialect.name != 'postgresql':
+        op.execute(
+            "UPDATE order_items SET created_at = "
+            "(SELECT orders.created_at FROM orders WHERE orders.id = order_items.order_id)"
+        )
+        return
+
+    for table in ('order_items', 'orders'):
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+        op.execute(f"ALTER INDEX {table}_pkey RENAME TO {table}_legacy_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_orders_sync_uuid")
+
+    for table in ('orders', 'order_items'):
+        op.execute(
+            f"CREATE TABLE {table} (LIKE {table}_legacy INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL")
+
+    # One partition per month from the oldest order to MONTHS_AHEAD from now,
+    # plus a default partition so an insert never fails for a missing month
+    oldest = conn.scalar(sa.text("SELECT min(created_at) FROM orders_legacy")) or datetime.utcnow()
+    month = datetime(oldest.year, oldest.month, 1)
+    last = _add_months(datetime.utcnow(), MONTHS_AHEAD)
+    while month <= last:
+        upper = _add_months(month, 1)
+        for table in ('orders', 'order_items'):
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            )
+        month = upper
+    for table in ('orders', 'order_items'):
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    # Copy before adding keys and indexes so they are built once, in bulk.
+    # order_items.created_at is filled from its order on the way in.
+    op.execute("INSERT INTO orders SELECT * FROM orders_legacy")
+    item_cols = [
+        c for c in conn.scalars(sa.text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = 'order_items_legacy' ORDER BY ordinal_position"
+        ))
+        if c != 'created_at'
+    ]
+    op.execute(
+        f"INSERT INTO order_items ({', '.join(item_cols)}, created_at) "
+        f"SELECT {', '.join('li.' + c for c in item_cols)}, o.created_at "
+        f"FROM order_items_legacy li JOIN orders_legacy o ON o.id = li.order_id"
+    )
+    for table in ('orders', 'order_items'):
+        # Keep the id sequence alive when the legacy table is dropped
+        # (NULL when the table has no owned sequence; nothing to hand over then)
+        seq = conn.scalar(sa.text(f"SELECT pg_get_serial_sequence('{table}_legacy', 'id')"))
+        if seq:
+            op.execute(f"ALTER SEQUENCE {seq} OWNED BY {table}.id")
+    op.execute("DROP TABLE order_items_legacy")
+    op.execute("DROP TABLE orders_legacy")
+
+    # The partition key has to be part of every primary key / unique index
+    op.execute("ALTER TABLE orders ADD PRIMARY KEY (id, created_at)")
+    op.execute("ALTER TABLE orders ADD FOREIGN KEY (supplier_id) REFERENCES suppliers (id)")
+    op.execute('ALTER TABLE orders ADD CONSTRAINT fk_orders_user_id FOREIGN KEY (user_id) REFERENCES "user" (id)')
+    op.execute("CREATE UNIQUE INDEX ix_orders_sync_uuid ON orders (sync_uuid, created_at)")
+    op.execute("CREATE INDEX ix_orders_created_at ON orders (created_at)")
+
+    op.execute("ALTER TABLE order_items ADD PRIMARY KEY (id, created_at)")
+    op.execute(
+        "ALTER TABLE order_items ADD FOREIGN KEY (order_id, created_at) "
+        "REFERENCES orders (id, created_at)"
+    )
+    op.execute('ALTER TABLE order_items ADD CONSTRAINT fk_order_items_user_id FOREIGN KEY (user_id) REFERENCES "user" (id)')
+    op.execute("CREATE INDEX ix_order_items_order_id ON order_items (order_id)")
+
+
+def downgrade():
+    # Orders already moved to archive files are not brought back
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        for table in ('order_items', 'orders'):
+            op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+
+        op.execute("CREATE TABLE orders (LIKE orders_partitioned INCLUDING DEFAULTS)")
+        op.execute("ALTER TABLE orders ALTER COLUMN created_at DROP NOT NULL")
+        op.execute("INSERT INTO orders SELECT * FROM orders_partitioned")
+        op.execute("CREATE TABLE order_items (LIKE order_items_partitioned INCLUDING DEFAULTS)")
+        op.execute("INSERT INTO order_items SELECT * FROM order_items_partitioned")
+        for table in ('orders', 'order_items'):
+            seq = conn.scalar(sa.text(f"SELECT pg_get_serial_sequence('{table}_partitioned', 'id')"))
+            if seq:
+                op.execute(f"ALTER SEQUENCE {seq} OWNED BY {table}.id")
+        op.execute("DROP TABLE order_items_partitioned")
+        op.execute("DROP TABLE orders_partitioned")
+
+        op.execute("ALTER TABLE orders ADD PRIMARY KEY (id)")
+        op.execute("ALTER TABLE orders ADD FOREIGN KEY (supplier_id) REFERENCES suppliers (id)")
+        op.execute('ALTER TABLE orders ADD CONSTRAINT fk_orders_user_id FOREIGN KEY (user_id) REFERENCES "user" (id)')
+        op.execute("CREATE UNIQUE INDEX ix_orders_sync_uuid ON orders (sync_uuid)")
+        op.execute("ALTER TABLE order_items ADD PRIMARY KEY (id)")
+        op.execute("ALTER TABLE order_items ADD FOREIGN KEY (order_id) REFERENCES orders (id)")
+        op.execute('ALTER TABLE order_items ADD CONSTRAINT fk_order_items_user_id FOREIGN KEY (user_id) REFERENCES "user" (id)')
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_column('created_at')
+
+    op.drop_table('order_archives')
@@ -1,3 +1,4 @@
+import uuid
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from flask_login import UserMixin
@@ -15,6 +16,8 @@ class Supplier(db.Model):
     phone = db.Column(db.String(20), nullable=False)
     category = db.Column(db.String(64))
     notes = db.Column(db.Text, nullable=True)
+    # Bumped on every change so outlet boxes can pull only what moved
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     items = db.relationship("Item", backref="supplier", cascade="all, delete-orphan")
 
 
@@ -28,6 +31,7 @@ class Item(db.Model):
     default_qty = db.Column(db.Float, nullable=False, default=1)
     item_type = db.Column(db.String(64), nullable=True)  # Dry, Frozen, Vegetables, etc.
     active = db.Column(db.Boolean, nullable=False, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     __table_args__ = (
         db.UniqueConstraint("supplier_id", "name", name="uq_item_per_supplier"),
@@ -54,6 +58,10 @@ class Order(db.Model):
     delivery_date = db.Column(db.Date)
     total_items = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Stable id across databases; local ids clash between outlets
+    sync_uuid = db.Column(db.String(32), unique=True, index=True, default=lambda: uuid.uuid4().hex)
+    synced_at = db.Column(db.DateTime, nullable=True)  # NULL = not yet pushed to central
+    sync_error = db.Column(db.String(200), nullable=True)  # why central rejected it; skipped until cleared
 
     # Relationship
     supplier = db.relationship("Supplier", backref="orders")
@@ -67,10 +75,27 @@ class OrderItem(db.Model):
     unit = db.Column(db.String(50), nullable=False)
     quantity = db.Column(db.Float, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Copy of the order's created_at; order_items is partitioned on it in Postgres
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationship
     order = db.relationship("Order", backref="order_items")
 
+class OrderArchive(db.Model):
+    __tablename__ = "order_archives"
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), unique=True, nullable=False)  # YYYY-MM
+    filename = db.Column(db.String(255), nullable=False)  # inside ORDER_ARCHIVE_DIR
+    min_order_id = db.Column(db.Integer, nullable=False)
+    max_order_id = db.Column(db.Integer, nullable=False)
+    order_count = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SyncState(db.Model):
+    __tablename__ = "sync_state"
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(200), nullable=True)
+
 class User(db.Model, UserMixin) :
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -0,0 +1,167 @@
+"""Seed a Postgres database and check the orders partitioning migration.
+
+Builds the schema as it was before e3a9c5f1b7d2, seeds it with orders
+spread over past months, then checks that upgrade and downgrade keep every
+row, and that ensure_partitions rescues rows stuck in a default partition.
+
+    python scripts/check_partition_migration.py --yes \
+        --database-url postgresql+psycopg://postgres@localhost/scratch
+
+The target comes only from --database-url or CHECK_DATABASE_URL (never
+DATABASE_URL), and the app's own databases are refused.
+
+WARNING: drops and recreates the public schema of the target database.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from dotenv import dotenv_values
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import downgrade, upgrade  # noqa: E402
+
+from app import create_app  # noqa: E402
+from archive import _add_months, _month_start, ensure_partitions, partition_name  # noqa: E402
+from config import Config, ProdConfig  # noqa: E402
+from models import db  # noqa: E402
+
+BEFORE = "7c1e4b9a2d10"
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS = os.path.join(APP_DIR, "migrations")
+
+
+def _server_db(url):
+    url = make_url(url)
+    return url.host or url.query.get("host"), url.port, url.database
+
+
+def app_databases():
+    """Databases the app itself uses; the check must never run against these."""
+    urls = {
+        Config.SQLALCHEMY_DATABASE_URI,
+        ProdConfig.SQLALCHEMY_DATABASE_URI,
+        os.environ.get("DATABASE_URL"),
+        dotenv_values(os.path.join(APP_DIR, ".env")).get("DATABASE_URL"),
+    }
+    return {_server_db(u) for u in urls if u}
+
+
+def seed(conn, orders, lines_per_order, months):
+    conn.execute(text('INSERT INTO "user" (email, password_hash) VALUES (\'seed@example.com\', \'x\')'))
+    conn.execute(text(
+        "INSERT INTO suppliers (user_id, name, phone, updated_at) "
+        "SELECT 1, 'Supplier ' || g, '6500000000', now() FROM generate_series(1, 10) g"
+    ))
+    conn.execute(text(
+        "INSERT INTO orders (user_id, supplier_id, outlet_name, total_items, created_at, sync_uuid) "
+        "SELECT 1, 1 + g % 10, 'Outlet', :lines, "
+        "now() - make_interval(months => :months) * (:orders - g) / :orders, md5(g::text) "
+        "FROM generate_series(1, :orders) g"
+    ), {"orders": orders, "lines": lines_per_order, "months": months})
+    conn.execute(text(
+        "INSERT INTO order_items (order_id, item_name, unit, quantity, user_id) "
+        "SELECT o.id, 'Item ' || k, 'kg', k, 1 FROM orders o, generate_series(1, :lines) k"
+    ), {"lines": lines_per_order})
+
+
+def counts(conn):
+    return (
+        conn.scalar(text("SELECT count(*) FROM orders")),
+        conn.scalar(text("SELECT count(*) FROM order_items")),
+    )
+
+
+def check(label, ok):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=300000)
+    parser.add_argument("--lines-per-order", type=int, default=4)
+    parser.add_argument("--months", type=int, default=36, help="Spread orders over this many past months")
+    parser.add_argument("--database-url", default=os.environ.get("CHECK_DATABASE_URL"),
+                        help="Scratch Postgres to wipe and seed (or set CHECK_DATABASE_URL)")
+    parser.add_argument("--yes", action="store_true", help="Confirm wiping the database")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("pass --database-url (or set CHECK_DATABASE_URL) for a scratch database")
+    if _server_db(args.database_url) in app_databases():
+        parser.error("refusing to wipe the app's own database; use a scratch one")
+    if not args.yes:
+        parser.error("this wipes the target database; pass --yes to go ahead")
+
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url
+
+    app = create_app(CheckConfig)
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != "postgresql":
+            parser.error("--database-url must point at Postgres")
+
+        # Schema as of the revision before partitioning
+        with engine.begin() as conn:
+            conn.execute(text("DROP SCHEMA public CASCADE; CREATE SCHEMA public"))
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE order_archives"))
+            conn.execute(text("ALTER TABLE order_items DROP COLUMN created_at"))
+            conn.execute(text("ALTER TABLE orders DROP COLUMN sync_error"))
+            conn.execute(text("CREATE TABLE alembic_version (version_num varchar(32) PRIMARY KEY)"))
+            conn.execute(text("INSERT INTO alembic_version VALUES (:v)"), {"v": BEFORE})
+            seed(conn, args.orders, args.lines_per_order, args.months)
+            seeded = counts(conn)
+        print(f"seeded {seeded[0]} orders, {seeded[1]} lines")
+
+        started = time.perf_counter()
+        upgrade(directory=MIGRATIONS)
+        print(f"upgrade took {time.perf_counter() - started:.1f}s")
+        with engine.connect() as conn:
+            check("row counts kept by upgrade", counts(conn) == seeded)
+            check("orders is partitioned", conn.scalar(text(
+                "SELECT relkind FROM pg_class WHERE relname = 'orders'")) == "p")
+            check("every line carries its order's created_at", conn.scalar(text(
+                "SELECT count(*) FROM order_items li JOIN orders o "
+                "ON o.id = li.order_id AND o.created_at = li.created_at")) == seeded[1])
+            check("default partitions empty", conn.scalar(text(
+                "SELECT count(*) FROM orders_default")) == 0)
+
+        # A lapsed cron: an order lands in a month with no partition yet
+        far = _add_months(_month_start(datetime.utcnow()), 8)
+        with engine.begin() as conn:
+            order_id = conn.scalar(text(
+                "INSERT INTO orders (user_id, supplier_id, outlet_name, created_at, sync_uuid) "
+                "VALUES (1, 1, 'Outlet', :at, 'lapsed') RETURNING id"
+            ), {"at": far})
+            conn.execute(text(
+                "INSERT INTO order_items (order_id, item_name, unit, quantity, user_id, created_at) "
+                "VALUES (:id, 'Item', 'kg', 1, 1, :at)"
+            ), {"id": order_id, "at": far})
+        with engine.begin() as conn:
+            created = ensure_partitions(conn)
+        with engine.connect() as conn:
+            check("ensure_partitions moved default rows", partition_name("orders", far) in created
+                  and conn.scalar(text("SELECT count(*) FROM orders_default")) == 0
+                  and conn.scalar(text(f"SELECT count(*) FROM {partition_name('order_items', far)}")) == 1)
+            expected = counts(conn)
+
+        started = time.perf_counter()
+        downgrade(directory=MIGRATIONS, revision=BEFORE)
+        print(f"downgrade took {time.perf_counter() - started:.1f}s")
+        with engine.connect() as conn:
+            check("row counts kept by downgrade", counts(conn) == expected)
+            check("orders is a plain table again", conn.scalar(text(
+                "SELECT relkind FROM pg_class WHERE relname = 'orders'")) == "r")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Sync between an outlet's local SQLite database and the central Postgres.
+
+Orders are created locally and pushed up in batches. The catalog (users,
+outlets, suppliers, items) is owned by the central database and pulled down.
+The functions take plain engines so they can be run against any two
+databases, e.g. two SQLite files.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+try:
+    from .models import User, Outlet, Supplier, Item, Order, OrderItem, SyncState
+except ImportError:
+    from models import User, Outlet, Supplier, Item, Order, OrderItem, SyncState
+
+log = logging.getLogger(__name__)
+
+CATALOG_WATERMARK = "catalog_pulled_at"
+# updated_at is stamped by the app at flush time, so a row can commit after a
+# pull with a stamp below that pull's watermark (or come from a worker whose
+# clock is behind). Each pull goes back this far; re-upserting is harmless.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def _get_state(conn, key):
+    return conn.scalar(select(SyncState.value).where(SyncState.key == key))
+
+
+def _set_state(conn, key, value):
+    _upsert(conn, SyncState.__table__, [{"key": key, "value": value}], key="key")
+
+
+def _upsert(conn, table, rows, key="id"):
+    if not rows:
+        return
+    if conn.dialect.name == "postgresql":
+        stmt = postgresql.insert(table)
+    elif conn.dialect.name == "sqlite":
+        stmt = sqlite.insert(table)
+    else:
+        raise RuntimeError(f"Upsert not supported on {conn.dialect.name}")
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[key]],
+        set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name != key},
+    )
+    conn.execute(stmt, [dict(r) for r in rows])
+
+
+def _without_id(row, **overrides):
+    values = {k: v for k, v in row.items() if k != "id"}
+    values.update(overrides)
+    return values
+
+
+def _insert_orders(conn, orders, lines, now):
+    """Insert orders (and their lines) not yet in central; returns how many went in."""
+    orders_t = Order.__table__
+    lines_t = OrderItem.__table__
+    already = set(conn.scalars(
+        select(orders_t.c.sync_uuid)
+        .where(orders_t.c.sync_uuid.in_([o["sync_uuid"] for o in orders]))
+    ))
+    if already:
+        log.info("Skipping %d order(s) already in central", len(already))
+    new_orders = [o for o in orders if o["sync_uuid"] not in already]
+    if not new_orders:
+        return 0
+    # Central assigns its own ids; remember them to re-point the lines
+    result = conn.execute(
+        insert(orders_t).returning(orders_t.c.id, sort_by_parameter_order=True),
+        [_without_id(o, synced_at=now) for o in new_orders],
+    )
+    remote_ids = dict(zip((o["id"] for o in new_orders), result.scalars()))
+    # Lines share their order's created_at (the partition key in central)
+    created = {o["id"]: o["created_at"] for o in new_orders}
+    new_lines = [
+        _without_id(
+            line,
+            order_id=remote_ids[line["order_id"]],
+            created_at=created[line["order_id"]],
+        )
+        for line in lines
+        if line["order_id"] in remote_ids
+    ]
+    if new_lines:
+        conn.execute(insert(lines_t), new_lines)
+    return len(new_orders)
+
+
+def push_orders(local_engine, central_engine, batch_size=200):
+    """Copy unsynced local orders (and their lines) to the central database.
+
+    Each batch is inserted in one central transaction and only then marked as
+    synced locally. If a previous run got the batch into central but died
+    before marking it, the orders are matched by sync_uuid and not inserted
+    twice. An order central rejects (e.g. its supplier was deleted there) gets
+    its sync_error set locally and is skipped from then on, so it doesn't hold
+    up the rest. Returns the number of orders inserted into central.
+    """
+    orders_t = Order.__table__
+    lines_t = OrderItem.__table__
+    pushed = 0
+    while True:
+        with local_engine.connect() as conn:
+            orders = conn.execute(
+                select(orders_t)
+                .where(orders_t.c.synced_at.is_(None), orders_t.c.sync_error.is_(None))
+                .order_by(orders_t.c.id)
+                .limit(batch_size)
+            ).mappings().all()
+            if not orders:
+                break
+            local_ids = [o["id"] for o in orders]
+            lines = conn.execute(
+                select(lines_t)
+                .where(lines_t.c.order_id.in_(local_ids))
+                .order_by(lines_t.c.id)
+            ).mappings().all()
+
+        now = datetime.utcnow()
+        failed = {}
+        try:
+            with central_engine.begin() as conn:
+                pushed += _insert_orders(conn, orders, lines, now)
+        except IntegrityError:
+            # Some order in the batch is rejected; push them one at a time to find it
+            for order in orders:
+                try:
+                    with central_engine.begin() as conn:
+                        pushed += _insert_orders(
+                            conn, [order], [l for l in lines if l["order_id"] == order["id"]], now
+                        )
+                except IntegrityError as exc:
+                    failed[order["id"]] = str(exc.orig)[:200]
+                    log.error(
+                        "Central rejected order %s (%s), skipping it until its sync_error is cleared: %s",
+                        order["id"], order["sync_uuid"], exc.orig,
+                    )
+
+        with local_engine.begin() as conn:
+            synced = [i for i in local_ids if i not in failed]
+            if synced:
+                conn.execute(
+                    update(orders_t).where(orders_t.c.id.in_(synced)).values(synced_at=now)
+                )
+            for order_id, error in failed.items():
+                conn.execute(
+                    update(orders_t).where(orders_t.c.id == order_id).values(sync_error=error)
+                )
+        if len(orders) < batch_size:
+            break
+    return pushed
+
+
+def _drop_conflicting(conn, table, rows, columns):
+    """Delete local rows that hold a unique value an incoming row is about to take.
+
+    Happens when central deletes or renames a row and another one takes its
+    name (or email); without this the upsert trips the unique constraint.
+    """
+    owner = {tuple(r[c] for c in columns): r["id"] for r in rows}
+    if not owner:
+        return
+    # A row that is itself incoming but under another name (e.g. a swap) goes
+    # too; the upsert puts it back with its new values
+    stale = [
+        row_id for row_id, *key in conn.execute(
+            select(table.c.id, *(table.c[c] for c in columns))
+        )
+        if owner.get(tuple(key), row_id) != row_id
+    ]
+    if stale:
+        log.warning("Replacing %d local %s row(s) clashing with central", len(stale), table.name)
+        conn.execute(delete(table).where(table.c.id.in_(stale)))
+
+
+def pull_catalog(local_engine, central_engine):
+    """Upsert the central catalog into the local database.
+
+    Users and outlets are small and copied in full. Suppliers and items are
+    fetched by updated_at since the last pull (less WATERMARK_OVERLAP), and
+    rows central no longer
+    has are deleted locally. Central wins a conflict: a local edit newer than
+    the central row is overwritten and logged, and a local row whose name
+    clashes with an incoming one is replaced.
+    Returns the number of supplier/item rows pulled or deleted.
+    """
+    with local_engine.connect() as conn:
+        since = _get_state(conn, CATALOG_WATERMARK)
+    since = datetime.fromisoformat(since) if since else None
+
+    changed, central_ids = {}, {}
+    with central_engine.connect() as conn:
+        users = conn.execute(select(User.__table__)).mappings().all()
+        outlets = conn.execute(select(Outlet.__table__)).mappings().all()
+        for model in (Supplier, Item):
+            qry = select(model.__table__)
+            if since:
+                qry = qry.where(model.updated_at >= since - WATERMARK_OVERLAP)
+            changed[model] = conn.execute(qry).mappings().all()
+            central_ids[model] = set(conn.scalars(select(model.id)))
+
+    deleted = 0
+    with local_engine.begin() as conn:
+        # Deletes first (items before their suppliers) so freed names can be reused
+        for model in (Item, Supplier):
+            gone = [i for i in conn.scalars(select(model.id)) if i not in central_ids[model]]
+            if gone:
+                conn.execute(delete(model.__table__).where(model.id.in_(gone)))
+                deleted += len(gone)
+
+        _drop_conflicting(conn, User.__table__, users, ("email",))
+        _upsert(conn, User.__table__, users)
+        _upsert(conn, Outlet.__table__, outlets)
+        for model, rows in changed.items():
+            remote = {r["id"]: r["updated_at"] for r in rows}
+            if remote:
+                for row_id, local_ts in conn.execute(
+                    select(model.id, model.updated_at).where(model.id.in_(list(remote)))
+                ):
+                    if local_ts and remote[row_id] and local_ts > remote[row_id]:
+                        log.warning(
+                            "Local edit to %s %s overwritten by central",
+                            model.__tablename__, row_id,
+                        )
+            if model is Item:
+                _drop_conflicting(conn, model.__table__, rows, ("supplier_id", "name"))
+            _upsert(conn, model.__table__, rows)
+
+        stamps = [r["updated_at"] for rows in changed.values() for r in rows if r["updated_at"]]
+        if since:
+            stamps.append(since)  # rows re-pulled from the overlap don't move it back
+        if stamps:
+            _set_state(conn, CATALOG_WATERMARK, max(stamps).isoformat())
+    return sum(len(rows) for rows in changed.values()) + deleted
+
+
+def sync_once(local_engine, central_engine, batch_size=200):
+    """Pull the catalog, then push orders; a failed pull doesn't hold up the push.
+
+    Returns (pulled, pushed); pulled is None when the pull failed.
+    """
+    try:
+        pulled = pull_catalog(local_engine, central_engine)
+    except Exception:
+        log.exception("Catalog pull failed, pushing orders anyway")
+        pulled = None
+    pushed = push_orders(local_engine, central_engine, batch_size)
+    return pulled, pushed
+
+
+def sync_forever(local_engine, central_engine, batch_size=200, interval=30):
+    """Run sync_once every `interval` seconds, riding out connection drops."""
+    while True:
+        try:
+            pulled, pushed = sync_once(local_engine, central_engine, batch_size)
+            log.info("Sync done: pulled %s catalog rows, pushed %d orders", pulled, pushed)
+        except Exception:
+            log.exception("Sync failed, retrying in %ds", interval)
+        time.sleep(interval)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# app.py builds an app at import time; edge mode keeps that on SQLite
+os.environ.setdefault("FLASK_ENV", "edge")
+os.environ.setdefault("SECRET_KEY", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import select
+
+import app as app_module
+from config import Config
+from models import db, User, Supplier, Item
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        SECRET_KEY = "test"
+
+    app = app_module.create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, email="chef@example.com", password_hash="x"))
+        db.session.add(Supplier(id=1, user_id=1, name="Veg Co", phone="6512345678"))
+        db.session.add_all([
+            Item(id=5, user_id=1, supplier_id=1, name="Rice", unit="kg", default_qty=1),
+            Item(id=6, user_id=1, supplier_id=1, name="Salt", unit="pkt", default_qty=2),
+            Item(id=7, user_id=1, supplier_id=1, name="Sugar", unit="kg", default_qty=3),
+        ])
+        db.session.commit()
+    return app
+
+
+def _row(item_id, name, unit="kg", default_qty="1", item_type="", active=True):
+    data = {
+        f"row_{item_id}": "1",
+        f"name_{item_id}": name,
+        f"unit_{item_id}": unit,
+        f"default_qty_{item_id}": default_qty,
+        f"item_type_{item_id}": item_type,
+    }
+    if active:
+        data[f"active_{item_id}"] = "on"
+    return data
+
+
+def _items(app):
+    with app.app_context():
+        return {it.id: (it.name, it.unit, it.default_qty) for it in db.session.scalars(select(Item))}
+
+
+def test_only_posted_rows_are_saved(app):
+    before = _items(app)
+    resp = app.test_client().post(
+        "/suppliers/1/items/bulk-edit", data=_row(6, "Sea salt", unit="kg", default_qty="4")
+    )
+    assert resp.status_code == 302
+    assert _items(app) == {**before, 6: ("Sea salt", "kg", 4.0)}
+
+
+def test_duplicate_name_is_reported_before_the_write(app):
+    before = _items(app)
+    resp = app.test_client().post("/suppliers/1/items/bulk-edit", data=_row(6, "Rice"))
+    assert resp.status_code == 400
+    assert b"Item name must be unique per supplier" in resp.data
+    assert _items(app) == before
+
+
+def test_names_can_be_swapped(app):
+    resp = app.test_client().post(
+        "/suppliers/1/items/bulk-edit", data={**_row(5, "Salt"), **_row(6, "Rice", unit="pkt")}
+    )
+    assert resp.status_code == 302
+    items = _items(app)
+    assert items[5][0] == "Salt"
+    assert items[6][0] == "Rice"
+
+
+def test_every_bad_row_is_reported(app):
+    before = _items(app)
+    resp = app.test_client().post("/suppliers/1/items/bulk-edit", data={
+        **_row(5, "", unit="kg"),
+        **_row(6, "Salt", default_qty="nan"),
+        **_row(7, "Sugar", default_qty="inf"),
+    })
+    assert resp.status_code == 400
+    assert b"3 row(s) need fixing" in resp.data
+    assert resp.data.count(b"Default qty must be a positive number") == 2
+    assert b"Name and unit are required" in resp.data
+    assert _items(app) == before
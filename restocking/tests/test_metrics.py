@@ -0,0 +1,24 @@
+import pytest
+
+import app as app_module
+from config import EdgeConfig
+
+
+@pytest.fixture
+def client(tmp_path):
+    class TestConfig(EdgeConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'edge.db'}"
+        SECRET_KEY = "test"
+        METRICS_TOKEN = "s3cret"
+
+    return app_module.create_app(TestConfig).test_client()
+
+
+@pytest.mark.parametrize("header, status", [
+    ("Bearer s3cret", 200),
+    ("Bearer wrong", 401),
+    # Non-ASCII tokens used to raise TypeError in compare_digest
+    ("Bearer é", 401),
+])
+def test_metrics_token(client, header, status):
+    assert client.get("/metrics", headers={"Authorization": header}).status_code == status
@@ -0,0 +1,255 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, func, select, update
+from werkzeug.security import generate_password_hash
+
+from models import db, User, Supplier, Item, Order, OrderItem
+from sync import CATALOG_WATERMARK, _get_state, pull_catalog, push_orders, sync_once
+
+
+@pytest.fixture
+def local(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'local.db'}")
+    db.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def central(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'central.db'}")
+
+    # Enforce foreign keys like the central Postgres does
+    @event.listens_for(engine, "connect")
+    def _foreign_keys(dbapi_conn, _record):
+        dbapi_conn.execute("PRAGMA foreign_keys=ON")
+
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert().values(
+            id=1, email="chef@example.com", password_hash=generate_password_hash("pw")
+        ))
+        conn.execute(Supplier.__table__.insert().values(id=1, user_id=1, name="Veg Co", phone="6512345678"))
+        conn.execute(Item.__table__.insert(), [
+            {"id": 5, "user_id": 1, "supplier_id": 1, "name": "Rice", "unit": "kg"},
+            {"id": 6, "user_id": 1, "supplier_id": 1, "name": "Salt", "unit": "pkt"},
+        ])
+    return engine
+
+
+def _add_orders(engine, count):
+    with engine.begin() as conn:
+        for n in range(count):
+            created = datetime.utcnow()
+            order_id = conn.execute(Order.__table__.insert().values(
+                user_id=1, supplier_id=1, outlet_name="Outlet", total_items=1,
+                created_at=created, sync_uuid=f"uuid-{n}-{created.timestamp()}",
+            )).inserted_primary_key[0]
+            conn.execute(OrderItem.__table__.insert().values(
+                order_id=order_id, item_name="Rice", unit="kg", quantity=n + 1,
+                user_id=1, created_at=created,
+            ))
+
+
+def _count(engine, model):
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(model.__table__))
+
+
+def _local_items(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(Item.id, Item.name)).all())
+
+
+def test_push_is_idempotent(local, central):
+    pull_catalog(local, central)
+    _add_orders(local, 5)
+
+    assert push_orders(local, central, batch_size=2) == 5
+    assert push_orders(local, central, batch_size=2) == 0
+    assert _count(central, Order) == 5
+    assert _count(central, OrderItem) == 5
+
+
+def test_repush_after_crash_does_not_duplicate(local, central):
+    pull_catalog(local, central)
+    _add_orders(local, 3)
+    push_orders(local, central)
+
+    # Central committed but the outlet died before marking the batch synced
+    with local.begin() as conn:
+        conn.execute(update(Order.__table__).values(synced_at=None))
+
+    assert push_orders(local, central) == 0
+    assert _count(central, Order) == 3
+    with local.connect() as conn:
+        assert conn.scalar(select(func.count()).where(Order.synced_at.is_(None))) == 0
+
+
+def test_pushed_lines_point_at_central_order_ids(local, central):
+    with central.begin() as conn:
+        conn.execute(Order.__table__.insert().values(
+            id=100, user_id=1, supplier_id=1, outlet_name="Other outlet", sync_uuid="central-only",
+        ))
+    pull_catalog(local, central)
+    _add_orders(local, 1)
+    push_orders(local, central)
+
+    with central.connect() as conn:
+        order_id, created = conn.execute(
+            select(Order.id, Order.created_at).where(Order.outlet_name == "Outlet")
+        ).one()
+        line = conn.execute(select(OrderItem.order_id, OrderItem.created_at)).one()
+    assert line == (order_id, created)
+
+
+def test_watermark_only_pulls_changed_rows(local, central):
+    now = datetime.utcnow()
+    with central.begin() as conn:
+        conn.execute(update(Supplier.__table__).values(updated_at=now - timedelta(days=1)))
+        conn.execute(update(Item.__table__).where(Item.id == 5).values(updated_at=now - timedelta(days=1)))
+        conn.execute(update(Item.__table__).where(Item.id == 6).values(updated_at=now - timedelta(hours=1)))
+    assert pull_catalog(local, central) == 3
+
+    with central.begin() as conn:
+        conn.execute(update(Item.__table__).where(Item.id == 6).values(unit="kg", updated_at=now))
+    # Only the edited item (at or after the watermark) comes down
+    assert pull_catalog(local, central) == 1
+    with local.connect() as conn:
+        assert conn.scalar(select(Item.unit).where(Item.id == 6)) == "kg"
+        assert _get_state(conn, CATALOG_WATERMARK) == now.isoformat()
+
+
+def test_watermark_overlap_catches_late_commits(local, central):
+    pull_catalog(local, central)
+    with local.connect() as conn:
+        mark = datetime.fromisoformat(_get_state(conn, CATALOG_WATERMARK))
+
+    # Stamped before the last pull's watermark but committed after the pull
+    with central.begin() as conn:
+        conn.execute(update(Item.__table__).where(Item.id == 5).values(
+            unit="bag", updated_at=mark - timedelta(minutes=1),
+        ))
+
+    pull_catalog(local, central)
+    with local.connect() as conn:
+        assert conn.scalar(select(Item.unit).where(Item.id == 5)) == "bag"
+        assert _get_state(conn, CATALOG_WATERMARK) == mark.isoformat()
+
+
+def test_central_delete_is_pulled(local, central):
+    pull_catalog(local, central)
+    with central.begin() as conn:
+        conn.execute(Item.__table__.delete().where(Item.id == 6))
+
+    pull_catalog(local, central)
+    assert _local_items(local) == {5: "Rice"}
+
+
+def test_recreated_name_replaces_stale_local_row(local, central):
+    pull_catalog(local, central)
+    with central.begin() as conn:
+        conn.execute(Item.__table__.delete().where(Item.id == 5))
+        conn.execute(Item.__table__.insert().values(
+            id=9, user_id=1, supplier_id=1, name="Rice", unit="kg",
+        ))
+
+    pull_catalog(local, central)
+    pull_catalog(local, central)
+    assert _local_items(local) == {6: "Salt", 9: "Rice"}
+
+
+def test_renamed_names_swap(local, central):
+    pull_catalog(local, central)
+    later = datetime.utcnow() + timedelta(seconds=5)
+    with central.begin() as conn:
+        conn.execute(update(Item.__table__).where(Item.id == 5).values(name="tmp"))
+        conn.execute(update(Item.__table__).where(Item.id == 6).values(name="Rice", updated_at=later))
+        conn.execute(update(Item.__table__).where(Item.id == 5).values(name="Salt", updated_at=later))
+
+    pull_catalog(local, central)
+    assert _local_items(local) == {5: "Salt", 6: "Rice"}
+
+
+def test_rejected_order_does_not_block_later_ones(local, central):
+    pull_catalog(local, central)
+    _add_orders(local, 3)
+    # The second order's supplier was deleted on central after it was taken
+    with local.begin() as conn:
+        second = conn.scalars(select(Order.id).order_by(Order.id)).all()[1]
+        conn.execute(update(Order.__table__).where(Order.id == second).values(supplier_id=2))
+
+    assert push_orders(local, central) == 2
+    assert push_orders(local, central) == 0
+    assert _count(central, Order) == 2
+    with local.connect() as conn:
+        rejected = conn.execute(
+            select(Order.id, Order.sync_error).where(Order.synced_at.is_(None))
+        ).one()
+    assert rejected.id == second
+    assert "FOREIGN KEY" in rejected.sync_error
+
+
+def test_failed_pull_still_pushes(local, central, monkeypatch):
+    pull_catalog(local, central)
+    _add_orders(local, 2)
+
+    def broken_pull(*_args):
+        raise RuntimeError("central catalog unreadable")
+
+    monkeypatch.setattr("sync.pull_catalog", broken_pull)
+    assert sync_once(local, central) == (None, 2)
+
+
+def test_edge_mode_order_entry_end_to_end(tmp_path, central):
+    import app as app_module
+    from config import EdgeConfig
+
+    class TestEdgeConfig(EdgeConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'edge.db'}"
+        SECRET_KEY = "test"
+
+    edge = app_module.create_app(TestEdgeConfig)
+    with edge.app_context():
+        db.create_all()
+        local = db.engine
+        assert sync_once(local, central) == (3, 0)
+
+    client = edge.test_client()
+    client.post("/login", data={"email": "chef@example.com", "password": "pw"})
+    resp = client.post("/suppliers/1/order/preview", data={"outlet_name": "Outlet", "qty_5": "3"})
+    assert resp.status_code == 200
+    assert b"wa.me" in resp.data
+
+    with edge.app_context():
+        assert sync_once(db.engine, central)[1] == 1
+    with central.connect() as conn:
+        row = conn.execute(
+            select(Order.user_id, OrderItem.item_name, OrderItem.quantity)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+        ).one()
+    assert tuple(row) == (1, "Rice", 3.0)
+
+
+def test_edge_mode_blocks_catalog_writes(tmp_path, central):
+    import app as app_module
+    from config import EdgeConfig
+
+    class TestEdgeConfig(EdgeConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'edge.db'}"
+        SECRET_KEY = "test"
+
+    edge = app_module.create_app(TestEdgeConfig)
+    with edge.app_context():
+        db.create_all()
+        sync_once(db.engine, central)
+
+    client = edge.test_client()
+    client.post("/login", data={"email": "chef@example.com", "password": "pw"})
+    resp = client.post("/suppliers/new", data={"name": "Local Co", "phone": "1"})
+    assert resp.status_code == 302
+    client.post("/items/5/edit", data={"name": "Brown rice", "unit": "kg"})
+
+    with edge.app_context():
+        assert _count(db.engine, Supplier) == 1
+        assert _local_items(db.engine)[5] == "Rice"